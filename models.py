@@ -2,6 +2,10 @@ import uuid
 import json
 from django.utils import timezone
 from django.db import models
+from django.db.backends.utils import names_digest
+from django.db.models.constants import LOOKUP_SEP
+from django.db.models.fields.json import KeyTextTransform
+from django.db.models.functions import Cast
 from django.contrib.auth.models import AbstractBaseUser,PermissionsMixin,BaseUserManager
 from phonenumber_field.modelfields import PhoneNumberField
 from django.contrib.auth.hashers import check_password
@@ -249,12 +253,79 @@ class UserProfile(BaseModel):
         }
 
 
+# Declared keys of UserSubTypeSpecificMapping.details per subtype, e.g.
+# {'<subtype>': {'<key>': {'type': str, 'indexed': True}}}.
+# Keys marked indexed get a (subtype, details->>key) expression index.
+SUBTYPE_DETAIL_SCHEMAS = {}
+
+INDEXED_DETAIL_KEYS = tuple(sorted({
+    key
+    for schema in SUBTYPE_DETAIL_SCHEMAS.values()
+    for key, field in schema.items()
+    if field.get('indexed')
+}))
+
+# Holds text the details migration could not parse as a JSON object.
+LEGACY_DETAIL_KEY = 'legacy'
+
+
+def detail_text(key):
+    # Cast keeps the expression text on SQLite, where ->> returns numbers as numbers.
+    return Cast(KeyTextTransform(key, 'details'), models.TextField())
+
+
+def detail_index_name(key):
+    return f'usersubtype_{names_digest(key, length=8)}_idx'
+
+
+class UserSubTypeSpecificMappingManager(models.Manager):
+    def with_detail(self, subtype, key, value):
+        if not key or LOOKUP_SEP in key:
+            raise ValueError(f"'{key}' is not a valid detail key.")
+        if isinstance(value, bool) or not isinstance(value, (str, int)):
+            raise ValueError("Detail lookups only support str and int values.")
+        return self.alias(detail_value=detail_text(key)).filter(
+            subtype=subtype, detail_value=str(value)
+        )
+
+
 class UserSubTypeSpecificMapping(BaseModel):
     user = models.OneToOneField(CustomUser, on_delete=models.CASCADE)
     subtype = models.CharField(max_length=150)
-    details = models.TextField()
+    details = models.JSONField(default=dict, blank=True)
+
+    objects = UserSubTypeSpecificMappingManager()
 
     class Meta:
         verbose_name = "User Sub Type Specific Mapping "
         verbose_name_plural = "User Sub Type Specific Mappings"
+        indexes = [
+            models.Index('subtype', detail_text(key), name=detail_index_name(key))
+            for key in INDEXED_DETAIL_KEYS
+        ]
 
+    # Runs through full_clean() (forms, admin), not save(): rows converted by
+    # the details migration are not checked against later schemas.
+    def clean(self):
+        if not isinstance(self.details, dict):
+            raise ValidationError("Details must be a JSON object.")
+        schema = SUBTYPE_DETAIL_SCHEMAS.get(self.subtype)
+        if schema is None:
+            return
+        unknown = set(self.details) - set(schema) - {LEGACY_DETAIL_KEY}
+        if unknown:
+            raise ValidationError(f"Unknown details for subtype '{self.subtype}': {', '.join(sorted(unknown))}.")
+        for key, field in schema.items():
+            value = self.details.get(key)
+            if value is None:
+                continue
+            if isinstance(value, bool) or not isinstance(value, field['type']):
+                raise ValidationError(f"Detail '{key}' must be of type {field['type'].__name__}.")
+
+    # JSONField decodes details once when the row is loaded, so this never
+    # re-parses; it only merges in the declared keys, which is cheap enough
+    # not to cache (a cache would go stale when details is reassigned).
+    @property
+    def parsed_details(self):
+        schema = SUBTYPE_DETAIL_SCHEMAS.get(self.subtype, {})
+        return {key: None for key in schema} | self.details
@@ -0,0 +1,107 @@
+"""
+Runbook: move UserSubTypeSpecificMapping.details from text to JSON.
+
+The accounts app has no migrations in this tree, so these steps are not
+shipped as migration files with a guessed dependency. Add them as three
+migrations on top of the app's latest migration and copy (do not import)
+the matching block into each, so the migrations stay frozen:
+
+1. ``manage.py makemigrations --empty accounts -n subtype_details_schema``
+   with ``operations = SCHEMA_OPERATIONS``. Only the rename and add run
+   here, so the table lock is held briefly.
+2. ``manage.py makemigrations --empty accounts -n subtype_details_data``
+   with ``atomic = False``, ``operations = DATA_OPERATIONS`` and the
+   functions above it. Every batch commits on its own.
+3. ``manage.py makemigrations --empty accounts -n subtype_details_cleanup``
+   with ``operations = CLEANUP_OPERATIONS``, then ``makemigrations accounts``
+   for any indexes declared in SUBTYPE_DETAIL_SCHEMAS.
+
+Text that is not a JSON object is kept under the ``legacy`` key, and the
+reverse of step 2 writes it back unchanged.
+"""
+import json
+
+from django.db import migrations, models, transaction
+
+
+BATCH_SIZE = 1000
+LEGACY_DETAIL_KEY = "legacy"
+
+
+SCHEMA_OPERATIONS = [
+    migrations.RenameField(
+        model_name="usersubtypespecificmapping",
+        old_name="details",
+        new_name="legacy_details",
+    ),
+    migrations.AddField(
+        model_name="usersubtypespecificmapping",
+        name="details",
+        field=models.JSONField(blank=True, default=dict),
+    ),
+]
+
+
+def parse_subtype_details(raw):
+    if not raw:
+        return {}
+    try:
+        value = json.loads(raw)
+    except ValueError:
+        return {LEGACY_DETAIL_KEY: raw}
+    return value if isinstance(value, dict) else {LEGACY_DETAIL_KEY: value}
+
+
+def unparse_subtype_details(details):
+    if not details:
+        return ""
+    if set(details) == {LEGACY_DETAIL_KEY}:
+        value = details[LEGACY_DETAIL_KEY]
+        return value if isinstance(value, str) else json.dumps(value)
+    return json.dumps(details)
+
+
+def copy_in_batches(apps, schema_editor, source, target, convert, batch_size):
+    # Page by pk instead of iterator(): SQLite does not isolate reads from
+    # writes on the same connection, and each page is updated in place.
+    alias = schema_editor.connection.alias
+    Mapping = apps.get_model("accounts", "UserSubTypeSpecificMapping")
+    rows = Mapping.objects.using(alias).order_by("pk")
+    last_pk = None
+    while True:
+        page = rows if last_pk is None else rows.filter(pk__gt=last_pk)
+        batch = list(page.only("pk", source)[:batch_size])
+        if not batch:
+            break
+        for row in batch:
+            setattr(row, target, convert(getattr(row, source)))
+        with transaction.atomic(using=alias):
+            Mapping.objects.using(alias).bulk_update(batch, [target])
+        last_pk = batch[-1].pk
+
+
+def details_to_json(apps, schema_editor):
+    copy_in_batches(apps, schema_editor, "legacy_details", "details", parse_subtype_details, BATCH_SIZE)
+
+
+def details_to_text(apps, schema_editor):
+    copy_in_batches(apps, schema_editor, "details", "legacy_details", unparse_subtype_details, BATCH_SIZE)
+
+
+DATA_OPERATIONS = [
+    migrations.RunPython(details_to_json, details_to_text),
+]
+
+
+CLEANUP_OPERATIONS = [
+    # Lets the reverse of RemoveField re-add the column to existing rows.
+    migrations.AlterField(
+        model_name="usersubtypespecificmapping",
+        name="legacy_details",
+        field=models.TextField(default=""),
+    ),
+    migrations.RemoveField(
+        model_name="usersubtypespecificmapping",
+        name="legacy_details",
+    ),
+]
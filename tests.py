@@ -0,0 +1,163 @@
+from unittest import mock
+
+from django.apps import apps
+from django.core.exceptions import ValidationError
+from django.db import connection, migrations, models
+from django.db.migrations.executor import MigrationExecutor
+from django.db.migrations.state import ProjectState
+from django.test import TestCase, TransactionTestCase
+
+import accounts.subtype_details_migrations as details_migrations
+from accounts.models import (
+    SUBTYPE_DETAIL_SCHEMAS,
+    CustomUser,
+    UserSubTypeSpecificMapping,
+    detail_index_name,
+)
+
+
+CORPORATE_SCHEMA = {
+    "Corporate": {
+        "grade": {"type": str},
+        "dependents": {"type": int},
+    },
+}
+
+
+def make_user(index):
+    return CustomUser.objects.create_user(
+        username=f"user{index}", password="secret", mobile=f"+9198765432{index:02d}"
+    )
+
+
+def make_migration(name, operations, atomic=True):
+    attrs = {"operations": operations, "atomic": atomic}
+    return type("Migration", (migrations.Migration,), attrs)(name, "accounts")
+
+
+class ParseSubtypeDetailsTests(TestCase):
+    def test_empty_text_is_empty_dict(self):
+        self.assertEqual(details_migrations.parse_subtype_details(""), {})
+
+    def test_json_object_is_parsed(self):
+        self.assertEqual(details_migrations.parse_subtype_details('{"grade": "A"}'), {"grade": "A"})
+
+    def test_non_json_text_is_kept_as_legacy(self):
+        self.assertEqual(details_migrations.parse_subtype_details("grade=A"), {"legacy": "grade=A"})
+
+    def test_json_non_object_is_kept_as_legacy(self):
+        self.assertEqual(details_migrations.parse_subtype_details("[1, 2]"), {"legacy": [1, 2]})
+
+    def test_legacy_values_reverse_to_original_text(self):
+        self.assertEqual(details_migrations.unparse_subtype_details({"legacy": "grade=A"}), "grade=A")
+        self.assertEqual(details_migrations.unparse_subtype_details({"legacy": [1, 2]}), "[1, 2]")
+
+
+@mock.patch.dict(SUBTYPE_DETAIL_SCHEMAS, CORPORATE_SCHEMA)
+class UserSubTypeSpecificMappingCleanTests(TestCase):
+    def test_unknown_key_is_rejected(self):
+        mapping = UserSubTypeSpecificMapping(subtype="Corporate", details={"colour": "red"})
+        with self.assertRaises(ValidationError):
+            mapping.clean()
+
+    def test_wrong_type_is_rejected(self):
+        mapping = UserSubTypeSpecificMapping(subtype="Corporate", details={"dependents": "two"})
+        with self.assertRaises(ValidationError):
+            mapping.clean()
+
+    def test_legacy_key_is_allowed(self):
+        mapping = UserSubTypeSpecificMapping(subtype="Corporate", details={"legacy": "grade=A"})
+        mapping.clean()
+
+    def test_save_does_not_enforce_schema(self):
+        UserSubTypeSpecificMapping.objects.create(
+            user=make_user(1), subtype="Corporate", details={"colour": "red"}
+        )
+
+    def test_parsed_details_fills_schema_keys(self):
+        mapping = UserSubTypeSpecificMapping(subtype="Corporate", details={"grade": "A"})
+        mapping.details = {"dependents": 2}
+        self.assertEqual(mapping.parsed_details, {"grade": None, "dependents": 2})
+
+
+class DetailIndexNameTests(TestCase):
+    def test_long_key_fits_index_name_limit(self):
+        self.assertLessEqual(len(detail_index_name("license_valid_till_and_more")), 30)
+
+
+class WithDetailTests(TestCase):
+    def setUp(self):
+        self.broker = UserSubTypeSpecificMapping.objects.create(
+            user=make_user(1), subtype="Regional Broker", details={"license_no": "BR-1"}
+        )
+        self.corporate = UserSubTypeSpecificMapping.objects.create(
+            user=make_user(2), subtype="Corporate", details={"dependents": 3}
+        )
+        UserSubTypeSpecificMapping.objects.create(
+            user=make_user(3), subtype="Corporate", details={"dependents": 1}
+        )
+
+    def test_matches_string_value(self):
+        found = UserSubTypeSpecificMapping.objects.with_detail("Regional Broker", "license_no", "BR-1")
+        self.assertEqual(list(found), [self.broker])
+
+    def test_matches_numeric_value(self):
+        found = UserSubTypeSpecificMapping.objects.with_detail("Corporate", "dependents", 3)
+        self.assertEqual(list(found), [self.corporate])
+
+    def test_lookup_path_key_is_rejected(self):
+        with self.assertRaises(ValueError):
+            UserSubTypeSpecificMapping.objects.with_detail("Corporate", "dependents__gt", 1)
+
+    def test_bool_value_is_rejected(self):
+        with self.assertRaises(ValueError):
+            UserSubTypeSpecificMapping.objects.with_detail("Corporate", "dependents", True)
+
+
+class SubtypeDetailsMigrationTests(TransactionTestCase):
+    legacy_texts = ['{"grade": "A"}', "grade=A", "", "[1, 2]", '{"dependents": 2}']
+
+    def setUp(self):
+        self.executor = MigrationExecutor(connection)
+        self.state = self.executor.apply_migration(
+            ProjectState.from_apps(apps),
+            make_migration("0000_text_details", [
+                migrations.RemoveField(model_name="usersubtypespecificmapping", name="details"),
+                migrations.AddField(
+                    model_name="usersubtypespecificmapping",
+                    name="details",
+                    field=models.TextField(default=""),
+                ),
+            ]),
+        )
+        self.steps = [
+            make_migration("0001_schema", details_migrations.SCHEMA_OPERATIONS),
+            make_migration("0002_data", details_migrations.DATA_OPERATIONS, atomic=False),
+            make_migration("0003_cleanup", details_migrations.CLEANUP_OPERATIONS),
+        ]
+        Mapping = self.state.apps.get_model("accounts", "UserSubTypeSpecificMapping")
+        for index, text in enumerate(self.legacy_texts):
+            Mapping.objects.create(user_id=make_user(index).pk, subtype="Corporate", details=text)
+
+    def migrate_forwards(self):
+        states = [self.state]
+        for step in self.steps:
+            states.append(self.executor.apply_migration(states[-1].clone(), step))
+        return states
+
+    def test_partial_final_batch_is_converted(self):
+        with mock.patch.object(details_migrations, "BATCH_SIZE", 2):
+            self.migrate_forwards()
+        self.assertEqual(
+            sorted(map(str, UserSubTypeSpecificMapping.objects.values_list("details", flat=True))),
+            sorted(map(str, [{"grade": "A"}, {"legacy": "grade=A"}, {}, {"legacy": [1, 2]}, {"dependents": 2}])),
+        )
+
+    def test_reverse_restores_original_text(self):
+        states = self.migrate_forwards()
+        for step, state in reversed(list(zip(self.steps, states))):
+            self.executor.unapply_migration(state.clone(), step)
+        Mapping = self.state.apps.get_model("accounts", "UserSubTypeSpecificMapping")
+        restored = sorted(Mapping.objects.values_list("details", flat=True))
+        self.migrate_forwards()
+        self.assertEqual(restored, sorted(['{"grade": "A"}', "grade=A", "", "[1, 2]", '{"dependents": 2}']))